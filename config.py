@@ -44,11 +44,23 @@ KNOWLEDGE_ASSISTANT_ENDPOINT_ID = "ka-d0808962-endpoint"  # Update this for your
 # AI Model Configuration for LLM
 AI_MODEL_NAME = "databricks-meta-llama-3-1-8b-instruct"  # Update this for your preferred model
 
+# Smaller model used for tool selection (routing) and direct answers;
+# AI_MODEL_NAME is kept for composing the final answer from tool results
+AI_ROUTER_MODEL_NAME = "databricks-meta-llama-3-1-8b-instruct"  # Update this for your routing model
+
 # Alternative models you can use:
 # - "databricks-meta-llama-3-1-70b-instruct" (larger, more capable)
 # - "databricks-dbrx-instruct" (Databricks optimized model)
 # - "databricks-mixtral-8x7b-instruct" (Mixtral model)
 
+# =============================================================================
+# MCP / KNOWLEDGE ASSISTANT TIMEOUTS
+# =============================================================================
+
+# Timeouts in seconds for outbound MCP and Knowledge Assistant calls
+MCP_CONNECT_TIMEOUT = 10.0  # Connecting and quick metadata calls (e.g. list_tools)
+MCP_READ_TIMEOUT = 60.0  # Waiting for Genie, UC function and Knowledge Assistant results
+
 # =============================================================================
 # CLOUD DEPLOYMENT CONFIGURATION
 # =============================================================================
@@ -64,6 +76,9 @@ WORKSPACE_HOSTNAME = os.getenv("WORKSPACE_HOSTNAME", WORKSPACE_HOSTNAME)
 GENIE_SPACE_ID = os.getenv("GENIE_SPACE_ID", GENIE_SPACE_ID)
 KNOWLEDGE_ASSISTANT_ENDPOINT_ID = os.getenv("KNOWLEDGE_ASSISTANT_ENDPOINT_ID", KNOWLEDGE_ASSISTANT_ENDPOINT_ID)
 AI_MODEL_NAME = os.getenv("AI_MODEL_NAME", AI_MODEL_NAME)
+AI_ROUTER_MODEL_NAME = os.getenv("AI_ROUTER_MODEL_NAME", AI_ROUTER_MODEL_NAME)
+MCP_CONNECT_TIMEOUT = float(os.getenv("MCP_CONNECT_TIMEOUT", MCP_CONNECT_TIMEOUT))
+MCP_READ_TIMEOUT = float(os.getenv("MCP_READ_TIMEOUT", MCP_READ_TIMEOUT))
 
 # In cloud environments, set WORKSPACE_HOSTNAME to auto-detect if not provided
 if not WORKSPACE_HOSTNAME or WORKSPACE_HOSTNAME == "":
@@ -84,7 +99,8 @@ def validate_config():
         "SCHEMA_NAME": SCHEMA_NAME,
         "GENIE_SPACE_ID": GENIE_SPACE_ID,
         "KNOWLEDGE_ASSISTANT_ENDPOINT_ID": KNOWLEDGE_ASSISTANT_ENDPOINT_ID,
-        "AI_MODEL_NAME": AI_MODEL_NAME
+        "AI_MODEL_NAME": AI_MODEL_NAME,
+        "AI_ROUTER_MODEL_NAME": AI_ROUTER_MODEL_NAME
     }
     
     # WORKSPACE_HOSTNAME and DATABRICKS_PROFILE are optional - can be auto-detected in cloud environments
@@ -110,3 +126,4 @@ if __name__ == "__main__":
     print(f"Genie Space: {GENIE_SPACE_ID}")
     print(f"Knowledge Assistant Endpoint: {KNOWLEDGE_ASSISTANT_ENDPOINT_ID}")
     print(f"AI Model: {AI_MODEL_NAME}")
+    print(f"AI Router Model: {AI_ROUTER_MODEL_NAME}")
@@ -49,7 +49,7 @@ class HealthcarePayorDemo:
         try:
             response = requests.get(f"{self.base_url}/health", timeout=5)
             return response.status_code == 200
-        except:
+        except requests.RequestException:
             return False
     
     def run_demo_query(self, query: str, tool_type: str) -> Dict[str, Any]:
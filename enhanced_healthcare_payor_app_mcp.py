@@ -15,6 +15,7 @@ from config import (
     GENIE_SPACE_ID,
     KNOWLEDGE_ASSISTANT_ENDPOINT_ID,
     AI_MODEL_NAME,
+    AI_ROUTER_MODEL_NAME,
     validate_config
 )
 
@@ -24,29 +25,67 @@ validate_config()
 # =============================================================================
 
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from datetime import datetime, timedelta
-import json
-import os
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any
+from pydantic import ValidationError
 
 # Import MCP clients
-from mcp_genie_client import get_genie_mcp_client, create_genie_tool_for_langchain
+# LangChain is imported lazily by the create_*_tool_for_langchain factories
+from mcp_genie_client import get_genie_mcp_client, create_genie_tool_for_langchain, create_genie_batch_tool_for_langchain
 from mcp_uc_functions_client import get_uc_functions_mcp_client, create_uc_functions_tools_for_langchain
 from mcp_knowledge_assistant_client import get_knowledge_assistant_mcp_client, create_knowledge_assistant_tool_for_langchain
+from mcp_common import get_workspace_client
 
-# LangChain imports
-from langchain.agents import create_tool_calling_agent, AgentExecutor
-from langchain.tools import BaseTool
-from langchain.memory import ConversationBufferWindowMemory
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import HumanMessage, AIMessage
+# System prompt for the healthcare payor agent (constant, built once at import)
+SYSTEM_PROMPT = """You are a helpful AI assistant for healthcare payor operations. 
+            When responding to users:
+            1. Show only the final, clean results
+            2. Do not display technical function calls or internal processing details
+            3. Present data in a clear, readable format
+            4. Avoid duplicate information or redundant explanations
+            5. Be concise and professional
+            Use the available tools to help users with member inquiries, claims processing, and provider management."""
+
+# Upper bound on tool calls from a single LLM turn that run at the same time
+MAX_PARALLEL_TOOL_CALLS = 8
+
+# Response clean-up patterns, compiled once at import
+_FUNCTION_MARKUP_RE = re.compile(r'<function=.*?>\{.*?\}</function>|</?function_output>')
+_EXTRA_BLANK_LINES_RE = re.compile(r'\n\s*\n\s*\n')
+_REDUNDANT_PHRASES = (
+    'However, since the previous output was empty',
+    'I hope this alternative result helps',
+    'Please note that the claim amounts are subject to audit',
+)
 
-# Databricks imports
-from databricks.sdk import WorkspaceClient
-from databricks.sdk.service.serving import EndpointCoreConfigInput
+# User-friendly fallback messages when a tool call fails, keyed by tool source
+TOOL_FALLBACK_MESSAGES = {
+    "uc_functions": "Unable to find data in UC Functions database. Trying alternative data sources...",
+    "genie": "Genie analysis unavailable. Trying other methods...",
+    "other": "Tool temporarily unavailable. Trying alternative approach...",
+}
+
+def _route_tool(tool_name: str) -> str:
+    """Map a tool name to its source ("uc_functions", "genie" or "other")"""
+    name = tool_name.lower()
+    if "uc_functions" in name:
+        return "uc_functions"
+    if "genie" in name:
+        return "genie"
+    return "other"
+
+def _to_openai_tool_spec(tool: Any) -> Dict[str, Any]:
+    """Convert a LangChain tool to the OpenAI function-calling format"""
+    return {
+        "type": "function",
+        "function": {
+            "name": tool.name,
+            "description": tool.description,
+            "parameters": tool.args_schema.model_json_schema() if hasattr(tool.args_schema, 'model_json_schema') else {}
+        }
+    }
 
 class EnhancedHealthcarePayorAgentMCP:
     """Enhanced Healthcare Payor Agent using Managed MCP Servers"""
@@ -57,6 +96,7 @@ class EnhancedHealthcarePayorAgentMCP:
         self.uc_functions_client = None
         self.knowledge_assistant_client = None
         self.tools = []
+        self.openai_tools = []
         self.agent_executor = None
         self._setup_clients()
         self._setup_tools()
@@ -65,12 +105,8 @@ class EnhancedHealthcarePayorAgentMCP:
     def _setup_clients(self):
         """Setup MCP clients"""
         try:
-            # Initialize workspace client
-            if DATABRICKS_PROFILE == "auto-detect":
-                # In cloud environments, let the SDK auto-detect the profile
-                self.workspace_client = WorkspaceClient()
-            else:
-                self.workspace_client = WorkspaceClient(profile=DATABRICKS_PROFILE)
+            # Initialize workspace client (shared with the MCP clients)
+            self.workspace_client = get_workspace_client(DATABRICKS_PROFILE)
             st.success("✅ Databricks workspace client initialized")
             
             # Initialize Genie MCP client
@@ -97,6 +133,7 @@ class EnhancedHealthcarePayorAgentMCP:
                 if self.genie_client.mcp_client:
                     genie_tool = create_genie_tool_for_langchain(self.genie_client)
                     self.tools.append(genie_tool)
+                    self.tools.append(create_genie_batch_tool_for_langchain(self.genie_client))
                     st.success("✅ Genie MCP tool loaded")
                 else:
                     st.warning("⚠️ Genie MCP client not properly initialized")
@@ -138,6 +175,9 @@ class EnhancedHealthcarePayorAgentMCP:
             # Create tool mapping
             self.tool_map = {tool.name: tool for tool in self.tools}
             
+            # Convert tools to OpenAI format once; the schemas don't change per request
+            self.openai_tools = [_to_openai_tool_spec(tool) for tool in self.tools]
+            
             # Initialize memory
             self.memory = []
             
@@ -149,12 +189,8 @@ class EnhancedHealthcarePayorAgentMCP:
     
     def _clean_response_content(self, content: str) -> str:
         """Clean up response content to remove technical clutter"""
-        import re
-        
-        # Remove function call tags
-        content = re.sub(r'<function=.*?>\{.*?\}</function>', '', content)
-        content = re.sub(r'<function_output>', '', content)
-        content = re.sub(r'</function_output>', '', content)
+        # Remove function call tags (single pass over the content)
+        content = _FUNCTION_MARKUP_RE.sub('', content)
         
         # Remove duplicate sections
         lines = content.split('\n')
@@ -163,7 +199,8 @@ class EnhancedHealthcarePayorAgentMCP:
         
         for line in lines:
             # Skip empty lines and technical markers
-            if not line.strip() or line.strip().startswith('<') or 'function=' in line:
+            stripped = line.strip()
+            if not stripped or stripped.startswith('<') or 'function=' in line:
                 continue
                 
             # Skip duplicate table headers
@@ -173,50 +210,65 @@ class EnhancedHealthcarePayorAgentMCP:
                 seen_sections.add('table_header')
             
             # Skip duplicate explanations
-            if 'However, since the previous output was empty' in line:
-                continue
-            if 'I hope this alternative result helps' in line:
-                continue
-            if 'Please note that the claim amounts are subject to audit' in line:
+            if any(phrase in line for phrase in _REDUNDANT_PHRASES):
                 continue
                 
             cleaned_lines.append(line)
         
         # Join lines and clean up extra whitespace
         cleaned_content = '\n'.join(cleaned_lines)
-        cleaned_content = re.sub(r'\n\s*\n\s*\n', '\n\n', cleaned_content)  # Remove multiple newlines
+        cleaned_content = _EXTRA_BLANK_LINES_RE.sub('\n\n', cleaned_content)  # Remove multiple newlines
         cleaned_content = cleaned_content.strip()
         
         return cleaned_content
     
+    def _execute_tool_call(self, tool_call) -> Dict[str, Any]:
+        """Run a single tool call requested by the LLM and build its tool message"""
+        tool_name = tool_call.function.name
+        
+        if tool_name not in self.tool_map:
+            return {
+                "tool_call_id": tool_call.id,
+                "role": "tool",
+                "name": tool_name,
+                "content": f"Tool {tool_name} not found"
+            }
+        
+        tool = self.tool_map[tool_name]
+        
+        # Parse arguments straight into the tool's Pydantic schema; malformed
+        # arguments are reported back to the LLM instead of failing the turn
+        try:
+            tool_args = dict(tool.args_schema.model_validate_json(tool_call.function.arguments or "{}"))
+        except ValidationError as e:
+            return {
+                "tool_call_id": tool_call.id,
+                "role": "tool",
+                "name": tool_name,
+                "content": f"Invalid arguments for tool {tool_name}: {e}"
+            }
+        
+        try:
+            result = tool._run(**tool_args)
+        except Exception as e:
+            # Show user-friendly error messages based on tool type
+            result = TOOL_FALLBACK_MESSAGES[_route_tool(tool_name)]
+        
+        return {
+            "tool_call_id": tool_call.id,
+            "role": "tool",
+            "name": tool_name,
+            "content": result
+        }
+    
     def chat(self, user_input: str) -> str:
         """Enhanced chat with MCP tools"""
         try:
             if not self.llm_client:
                 return "Agent not initialized"
             
-            # Convert tools to OpenAI format
-            openai_tools = []
-            for tool in self.tools:
-                tool_spec = {
-                    "type": "function",
-                    "function": {
-                        "name": tool.name,
-                        "description": tool.description,
-                        "parameters": tool.args_schema.model_json_schema() if hasattr(tool.args_schema, 'model_json_schema') else {}
-                    }
-                }
-                openai_tools.append(tool_spec)
-            
             # Prepare messages
-            messages = [{"role": "system", "content": """You are a helpful AI assistant for healthcare payor operations. 
-            When responding to users:
-            1. Show only the final, clean results
-            2. Do not display technical function calls or internal processing details
-            3. Present data in a clear, readable format
-            4. Avoid duplicate information or redundant explanations
-            5. Be concise and professional
-            Use the available tools to help users with member inquiries, claims processing, and provider management."""}]
+            messages = [{"role": "system", "content": SYSTEM_PROMPT}]
             
             # Add conversation history
             for msg in self.memory[-10:]:  # Keep last 10 messages
@@ -225,11 +277,11 @@ class EnhancedHealthcarePayorAgentMCP:
             # Add current user message
             messages.append({"role": "user", "content": user_input})
             
-            # Call LLM with tools
+            # Call the smaller router model to pick tools (or answer directly)
             response = self.llm_client.chat.completions.create(
-                model=AI_MODEL_NAME,
+                model=AI_ROUTER_MODEL_NAME,
                 messages=messages,
-                tools=openai_tools,
+                tools=self.openai_tools,
                 tool_choice="auto"
             )
             
@@ -240,44 +292,9 @@ class EnhancedHealthcarePayorAgentMCP:
                 # Add assistant message to memory
                 self.memory.append({"role": "assistant", "content": message.content, "tool_calls": message.tool_calls})
                 
-                # Execute tool calls
-                tool_results = []
-                for tool_call in message.tool_calls:
-                    tool_name = tool_call.function.name
-                    tool_args = json.loads(tool_call.function.arguments)
-                    
-                    if tool_name in self.tool_map:
-                        try:
-                            tool = self.tool_map[tool_name]
-                            result = tool._run(**tool_args)
-                            tool_results.append({
-                                "tool_call_id": tool_call.id,
-                                "role": "tool",
-                                "name": tool_name,
-                                "content": result
-                            })
-                        except Exception as e:
-                            # Show user-friendly error messages based on tool type
-                            if "uc_functions" in tool_name.lower():
-                                error_msg = f"Unable to find data in UC Functions database. Trying alternative data sources..."
-                            elif "genie" in tool_name.lower():
-                                error_msg = f"Genie analysis unavailable. Trying other methods..."
-                            else:
-                                error_msg = f"Tool temporarily unavailable. Trying alternative approach..."
-                            
-                            tool_results.append({
-                                "tool_call_id": tool_call.id,
-                                "role": "tool", 
-                                "name": tool_name,
-                                "content": error_msg
-                            })
-                    else:
-                        tool_results.append({
-                            "tool_call_id": tool_call.id,
-                            "role": "tool",
-                            "name": tool_name,
-                            "content": f"Tool {tool_name} not found"
-                        })
+                # Execute tool calls concurrently; each one is an independent MCP round trip
+                with ThreadPoolExecutor(max_workers=min(len(message.tool_calls), MAX_PARALLEL_TOOL_CALLS)) as executor:
+                    tool_results = list(executor.map(self._execute_tool_call, message.tool_calls))
                 
                 # Add tool results to conversation
                 messages.extend(tool_results)
@@ -294,7 +311,7 @@ class EnhancedHealthcarePayorAgentMCP:
                 final_content = self._clean_response_content(final_content)
                 
                 # Add success message if Genie was used successfully
-                successful_tools = [result for result in tool_results if "genie" in result.get("name", "").lower() and "error" not in str(result.get("content", "")).lower()]
+                successful_tools = [result for result in tool_results if _route_tool(result.get("name", "")) == "genie" and "error" not in str(result.get("content", "")).lower()]
                 if successful_tools:
                     final_content = f"✅ Found the answer using Genie AI analysis:\n\n{final_content}"
                 
@@ -349,10 +366,7 @@ def create_mcp_status_dashboard():
         
         st.markdown("#### Knowledge Assistant")
         try:
-            if DATABRICKS_PROFILE == "auto-detect":
-                knowledge_client = get_knowledge_assistant_mcp_client(WorkspaceClient())
-            else:
-                knowledge_client = get_knowledge_assistant_mcp_client(WorkspaceClient(profile=DATABRICKS_PROFILE))
+            knowledge_client = get_knowledge_assistant_mcp_client(get_workspace_client(DATABRICKS_PROFILE))
             knowledge_health = knowledge_client.get_health_status()
             
             if knowledge_health["status"] == "healthy":
@@ -386,11 +400,13 @@ def main():
         - Natural language data queries
         - Advanced analytics
         - Structured data insights
+        - Batched concurrent queries
         
         **UC Functions MCP:**
         - Member lookup
         - Claims lookup  
         - Provider lookup
+        - Batched concurrent lookups
         
         **Knowledge Assistant:**
         - Document analysis
@@ -446,6 +462,9 @@ def main():
     
 
 if __name__ == "__main__":
+    # MCP clients report connection status through logging rather than the UI
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    
     # Initialize session state
     if 'messages' not in st.session_state:
         st.session_state.messages = []
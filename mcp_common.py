@@ -0,0 +1,302 @@
+"""
+Shared helpers for the Healthcare Payor AI System MCP clients
+Provides a process-wide Databricks workspace client and client caching reused by all MCP integrations
+"""
+
+import asyncio
+import functools
+import logging
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Type
+import httpx
+from databricks.sdk import WorkspaceClient
+from databricks.sdk.errors import DatabricksError
+
+logger = logging.getLogger(__name__)
+
+# Transient network failures worth retrying (e.g. serving endpoints scaling up from zero).
+# DatabricksMCPClient talks to the server through httpx inside an anyio task group, so its
+# connection/read failures surface as httpx.TransportError, usually wrapped in an ExceptionGroup
+# (see is_retryable)
+RETRYABLE_ERRORS: Tuple[Type[BaseException], ...] = (ConnectionError, TimeoutError, OSError, httpx.TransportError)
+
+class CallTimeoutError(TimeoutError):
+    """Raised by call_with_timeout() when a call was sent but did not finish in time"""
+
+# API errors from the Databricks SDK subclass OSError but are not transient here (auth,
+# permission, not found); the SDK already retries throttling and unavailability itself.
+# A timed-out call may still be running server-side, so it is not re-sent either.
+NON_RETRYABLE_ERRORS: Tuple[Type[BaseException], ...] = (DatabricksError, CallTimeoutError)
+
+@functools.lru_cache(maxsize=None)
+def get_workspace_client(profile: str = "auto-detect") -> WorkspaceClient:
+    """
+    Get the shared Databricks workspace client for a profile
+
+    One client (with its HTTP connection pool and auth token cache) is created
+    per profile and reused by the app and every MCP client for the life of the
+    process. Plain lru_cache keeps this module usable outside a Streamlit runtime.
+
+    Args:
+        profile: Databricks CLI profile name, or "auto-detect" in cloud environments
+
+    Returns:
+        Cached WorkspaceClient instance
+    """
+    if profile == "auto-detect":
+        # In cloud environments, let the SDK auto-detect the profile
+        return WorkspaceClient()
+    return WorkspaceClient(profile=profile)
+
+class ClientCache:
+    """Thread-safe cache of initialized MCP clients with hit/miss statistics"""
+
+    def __init__(self):
+        self._clients: Dict[tuple, Any] = {}
+        self._lock = threading.Lock()
+        # Per-key locks so building one client (which may hit the network) doesn't
+        # block cache hits for other keys, while concurrent misses on a key build once
+        self._key_locks: Dict[tuple, threading.Lock] = {}
+        self._hits = 0
+        self._misses = 0
+        self._init_time_ms = 0.0
+
+    def get_or_create(self, key: tuple, factory: Callable[[], Any], is_usable: Callable[[Any], bool] = lambda client: True) -> Any:
+        """
+        Return the cached client for key, creating it with factory on a miss
+
+        Args:
+            key: Cache key, e.g. (hostname, space_id, profile)
+            factory: Zero-argument callable that builds the client
+            is_usable: Predicate deciding whether a new client may be cached;
+                clients that failed to connect are returned but not cached
+
+        Returns:
+            Initialized client
+        """
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._hits += 1
+                return client
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Another thread may have built the client while we waited
+            with self._lock:
+                client = self._clients.get(key)
+                if client is not None:
+                    self._hits += 1
+                    return client
+                self._misses += 1
+
+            start = time.perf_counter()
+            client = factory()
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            with self._lock:
+                self._init_time_ms += elapsed_ms
+                if is_usable(client):
+                    self._clients[key] = client
+            return client
+
+    def clear(self):
+        """Drop all cached clients"""
+        with self._lock:
+            self._clients.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache hit/miss counts and total client initialization time"""
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "init_time_ms": round(self._init_time_ms, 2),
+                "cached_clients": len(self._clients)
+            }
+
+class ResponseCache:
+    """Thread-safe LRU cache for read-only query results, with optional expiry"""
+
+    def __init__(self, maxsize: int = 512, ttl_seconds: Optional[float] = None):
+        """
+        Initialize response cache
+
+        Args:
+            maxsize: Maximum number of entries; the least recently used entry is evicted first
+            ttl_seconds: Entry lifetime in seconds, or None to keep entries until evicted
+        """
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value for key, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if self.ttl_seconds is not None and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        """Store value for key, evicting the least recently used entry when full"""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
+
+def is_cacheable(result: Any) -> bool:
+    """
+    Check an MCP tool result's caching hint
+
+    Tool authors can mark results that must not be reused (e.g. live
+    aggregations) by returning "_meta": {"cache_hint": "no-cache"}. Results
+    without a hint, such as deterministic lookups, are treated as cacheable.
+    Tool failures come back as results with isError set rather than as
+    exceptions, and are never cached.
+
+    Args:
+        result: CallToolResult returned by an MCP server
+
+    Returns:
+        False if the result is an error or carries a "no-cache" hint, True otherwise
+    """
+    if getattr(result, "isError", False):
+        return False
+    meta = getattr(result, "meta", None) or getattr(result, "_meta", None) or {}
+    return not (isinstance(meta, dict) and meta.get("cache_hint") == "no-cache")
+
+def is_retryable(error: BaseException, retry_on: Tuple[Type[BaseException], ...] = RETRYABLE_ERRORS,
+                 no_retry_on: Tuple[Type[BaseException], ...] = NON_RETRYABLE_ERRORS) -> bool:
+    """
+    Check whether an error is a transient failure worth retrying
+
+    Exception groups (as raised by the MCP client's task group) count as
+    retryable only when every leaf exception is.
+
+    Args:
+        error: Exception raised by the call
+        retry_on: Exception types considered transient
+        no_retry_on: Subclasses of retry_on that are never retried
+
+    Returns:
+        True if the call can be retried
+    """
+    if isinstance(error, BaseExceptionGroup):
+        return all(is_retryable(e, retry_on, no_retry_on) for e in error.exceptions)
+    return isinstance(error, retry_on) and not isinstance(error, no_retry_on)
+
+def retry_call(fn: Callable[..., Any], *args, max_attempts: int = 3, base_delay: float = 1.0,
+               retry_on: Tuple[Type[BaseException], ...] = RETRYABLE_ERRORS,
+               no_retry_on: Tuple[Type[BaseException], ...] = NON_RETRYABLE_ERRORS, **kwargs) -> Any:
+    """
+    Call fn, retrying transient failures with exponential backoff and jitter
+
+    Args:
+        fn: Callable to invoke
+        *args: Positional arguments for fn
+        max_attempts: Total number of attempts before giving up
+        base_delay: Delay in seconds before the first retry; doubles on each retry
+        retry_on: Exception types that trigger a retry; anything else is raised immediately
+        no_retry_on: Subclasses of retry_on that are raised immediately anyway
+            (both are checked against each leaf of an ExceptionGroup, see is_retryable)
+        **kwargs: Keyword arguments for fn
+
+    Returns:
+        The return value of fn
+    """
+    for attempt in range(max_attempts):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == max_attempts - 1 or not is_retryable(e, retry_on, no_retry_on):
+                raise
+            delay = base_delay * (2 ** attempt) + random.uniform(0, 0.25)
+            logger.warning("Attempt %d/%d of %s failed (%s); retrying in %.2fs",
+                           attempt + 1, max_attempts, getattr(fn, "__name__", fn), e, delay)
+            time.sleep(delay)
+
+async def aretry_call(fn: Callable[..., Any], *args, max_attempts: int = 3, base_delay: float = 1.0,
+                      retry_on: Tuple[Type[BaseException], ...] = RETRYABLE_ERRORS,
+                      no_retry_on: Tuple[Type[BaseException], ...] = NON_RETRYABLE_ERRORS, **kwargs) -> Any:
+    """
+    Async counterpart of retry_call() for coroutine functions
+
+    Args:
+        fn: Coroutine function to await
+        *args: Positional arguments for fn
+        max_attempts: Total number of attempts before giving up
+        base_delay: Delay in seconds before the first retry; doubles on each retry
+        retry_on: Exception types that trigger a retry; anything else is raised immediately
+        no_retry_on: Subclasses of retry_on that are raised immediately anyway
+            (both are checked against each leaf of an ExceptionGroup, see is_retryable)
+        **kwargs: Keyword arguments for fn
+
+    Returns:
+        The awaited return value of fn
+    """
+    for attempt in range(max_attempts):
+        try:
+            return await fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == max_attempts - 1 or not is_retryable(e, retry_on, no_retry_on):
+                raise
+            delay = base_delay * (2 ** attempt) + random.uniform(0, 0.25)
+            logger.warning("Attempt %d/%d of %s failed (%s); retrying in %.2fs",
+                           attempt + 1, max_attempts, getattr(fn, "__name__", fn), e, delay)
+            await asyncio.sleep(delay)
+
+def call_with_timeout(executor: ThreadPoolExecutor, fn: Callable[..., Any], timeout: float, *args, **kwargs) -> Any:
+    """
+    Call fn on executor, raising TimeoutError if it does not return within timeout seconds
+
+    Used for DatabricksMCPClient, which has no timeout setting. Each MCP client
+    passes its own executor, so calls hung on one server can't starve another.
+    The timeout counts from when fn starts running; time queued behind the
+    client's other calls is bounded separately by the same timeout.
+
+    Args:
+        executor: The calling client's worker pool
+        fn: Callable to invoke
+        timeout: Maximum seconds to wait for fn to start, and then to finish
+        *args: Positional arguments for fn
+        **kwargs: Keyword arguments for fn
+
+    Returns:
+        The return value of fn
+
+    Raises:
+        TimeoutError: fn never started; it was cancelled and is safe to retry
+        CallTimeoutError: fn started but did not finish; it keeps running in its
+            worker thread, but the caller is released
+    """
+    started = threading.Event()
+
+    def run():
+        started.set()
+        return fn(*args, **kwargs)
+
+    name = getattr(fn, "__name__", fn)
+    future = executor.submit(run)
+    if not started.wait(timeout) and future.cancel():
+        raise TimeoutError(f"{name} did not start within {timeout}s (all workers busy)")
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        raise CallTimeoutError(f"{name} did not complete within {timeout}s") from None
@@ -3,17 +3,22 @@ Genie MCP Server Integration for Healthcare Payor AI System
 Implements managed MCP server for Genie space queries
 """
 
-import os
-import json
+import functools
+import logging
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional
-from databricks.sdk import WorkspaceClient
 from databricks_mcp import DatabricksMCPClient
-import streamlit as st
+from mcp_common import ClientCache, ResponseCache, call_with_timeout, get_workspace_client, is_cacheable, retry_call
+
+logger = logging.getLogger(__name__)
 
 class GenieMCPClient:
     """Client for interacting with Genie managed MCP server"""
     
-    def __init__(self, workspace_hostname: str, genie_space_id: str, profile: str = "DEFAULT_azure"):
+    def __init__(self, workspace_hostname: str, genie_space_id: str, profile: str = "DEFAULT_azure",
+                 cache_ttl_seconds: float = 300, connect_timeout_s: float = 10.0, read_timeout_s: float = 60.0):
         """
         Initialize Genie MCP client
         
@@ -21,18 +26,26 @@ class GenieMCPClient:
             workspace_hostname: Databricks workspace hostname
             genie_space_id: Genie space ID
             profile: Databricks CLI profile name
+            cache_ttl_seconds: How long the tool list from list_tools() is reused
+            connect_timeout_s: Timeout in seconds for quick metadata calls such as list_tools()
+            read_timeout_s: Timeout in seconds for Genie queries
         """
         self.workspace_hostname = workspace_hostname
         self.genie_space_id = genie_space_id
         self.profile = profile
+        self._tools_ttl = cache_ttl_seconds
+        self.connect_timeout_s = connect_timeout_s
+        self.read_timeout_s = read_timeout_s
+        # Worker threads that bound MCP calls to the timeouts above (see call_with_timeout)
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="genie-mcp")
+        self._tools_cache: Optional[List[Dict[str, Any]]] = None
+        self._tools_cache_ts: float = 0.0
+        # Genie answers come from live tables, so cached results expire after 5 minutes
+        self._response_cache = ResponseCache(maxsize=512, ttl_seconds=300)
         self.mcp_url = f"https://{workspace_hostname}/api/2.0/mcp/genie/{genie_space_id}"
         
-        # Initialize workspace client
-        if profile == "auto-detect":
-            # In cloud environments, let the SDK auto-detect the profile
-            self.workspace_client = WorkspaceClient()
-        else:
-            self.workspace_client = WorkspaceClient(profile=profile)
+        # Reuse the shared workspace client for this profile
+        self.workspace_client = get_workspace_client(profile)
         
         # In cloud environments, get hostname from workspace client if not provided
         if not workspace_hostname or workspace_hostname == "auto-detect":
@@ -40,7 +53,7 @@ class GenieMCPClient:
                 # Try to get hostname from workspace client (works in cloud environments)
                 self.workspace_hostname = self.workspace_client.config.host
                 self.mcp_url = f"https://{self.workspace_hostname}/api/2.0/mcp/genie/{genie_space_id}"
-            except:
+            except AttributeError:
                 # Fallback to provided hostname
                 self.workspace_hostname = workspace_hostname
                 self.mcp_url = f"https://{workspace_hostname}/api/2.0/mcp/genie/{genie_space_id}"
@@ -56,9 +69,9 @@ class GenieMCPClient:
                 server_url=self.mcp_url,
                 workspace_client=self.workspace_client
             )
-            st.success(f"✅ Connected to Genie MCP server: {self.mcp_url}")
+            logger.info("Connected to Genie MCP server: %s", self.mcp_url)
         except Exception as e:
-            st.error(f"❌ Failed to connect to Genie MCP server: {e}")
+            logger.error("Failed to connect to Genie MCP server: %s", e)
             self.mcp_client = None
     
     def list_tools(self) -> List[Dict[str, Any]]:
@@ -66,19 +79,30 @@ class GenieMCPClient:
         if not self.mcp_client:
             return []
         
+        # Tool schemas are stable for a server version, so reuse them until the TTL expires
+        if self._tools_cache and time.monotonic() - self._tools_cache_ts < self._tools_ttl:
+            return self._tools_cache
+        
         try:
-            tools = self.mcp_client.list_tools()
-            return [{"name": tool.name, "description": tool.description} for tool in tools]
+            tools = call_with_timeout(self._executor, self.mcp_client.list_tools, self.connect_timeout_s)
+            self._tools_cache = [{"name": tool.name, "description": tool.description} for tool in tools]
+            self._tools_cache_ts = time.monotonic()
+            return self._tools_cache
         except Exception as e:
-            st.error(f"❌ Failed to list Genie tools: {e}")
+            logger.error("Failed to list Genie tools: %s", e)
             return []
     
-    def query_genie(self, query: str) -> Dict[str, Any]:
+    def query_genie(self, query: str, cache: bool = True, force_refresh: bool = False) -> Dict[str, Any]:
         """
         Query Genie space using natural language
         
+        Results are cached unless the server marks them "_meta": {"cache_hint": "no-cache"}.
+        
         Args:
             query: Natural language query for Genie
+            cache: Serve repeated queries from the response cache; pass False to
+                always hit the MCP server (the fresh result is still not cached)
+            force_refresh: Skip the cache lookup but store the fresh result
             
         Returns:
             Dictionary containing query results
@@ -86,14 +110,29 @@ class GenieMCPClient:
         if not self.mcp_client:
             return {"error": "MCP client not initialized"}
         
+        if cache and not force_refresh:
+            cached = self._response_cache.get(query)
+            if cached is not None:
+                return {
+                    "success": True,
+                    "query": query,
+                    "result": cached,
+                    "tool_used": "Genie MCP"
+                }
+        
         try:
             # Use the genie_query tool from MCP server
-            result = self.mcp_client.call_tool("genie_query", {"query": query})
+            result = retry_call(
+                call_with_timeout, self._executor, self.mcp_client.call_tool, self.read_timeout_s, "genie_query", {"query": query}
+            )
+            content = result.content if hasattr(result, 'content') else str(result)
+            if cache and is_cacheable(result):
+                self._response_cache.put(query, content)
             
             return {
                 "success": True,
                 "query": query,
-                "result": result.content if hasattr(result, 'content') else str(result),
+                "result": content,
                 "tool_used": "Genie MCP"
             }
         except Exception as e:
@@ -104,8 +143,41 @@ class GenieMCPClient:
                 "tool_used": "Genie MCP"
             }
     
+    def invalidate_cache(self):
+        """Drop all cached Genie query results"""
+        self._response_cache.clear()
+    
+    async def batch_query(self, queries: List[str], max_concurrent: int = 8) -> List[Dict[str, Any]]:
+        """
+        Run several Genie queries concurrently
+        
+        Args:
+            queries: Natural language queries for Genie
+            max_concurrent: Maximum number of queries in flight at once
+            
+        Returns:
+            List of query result dictionaries, in the same order as queries
+        """
+        semaphore = asyncio.Semaphore(max_concurrent)
+        
+        async def run(query: str) -> Dict[str, Any]:
+            async with semaphore:
+                # DatabricksMCPClient is synchronous, so each query runs in a worker thread
+                return await asyncio.to_thread(self.query_genie, query)
+        
+        return await asyncio.gather(*(run(q) for q in queries))
+    
+    def batch_query_sync(self, queries: List[str], max_concurrent: int = 8) -> List[Dict[str, Any]]:
+        """Synchronous wrapper around batch_query() for non-async callers such as LangChain tools"""
+        return asyncio.run(self.batch_query(queries, max_concurrent))
+    
     def get_health_status(self) -> Dict[str, Any]:
-        """Check health status of Genie MCP connection"""
+        """
+        Check health status of Genie MCP connection
+        
+        Within the tool-list TTL this is answered from list_tools()'s cache; once it
+        expires the server is contacted again, so an outage shows up as unhealthy.
+        """
         try:
             tools = self.list_tools()
             return {
@@ -121,15 +193,16 @@ class GenieMCPClient:
                 "mcp_url": self.mcp_url
             }
 
-def create_genie_tool_for_langchain(genie_client: GenieMCPClient):
+@functools.lru_cache(maxsize=None)
+def _genie_tool_classes() -> tuple:
     """
-    Create a LangChain tool wrapper for Genie MCP client
+    Build the LangChain tool classes for Genie once per process
+    
+    Defining BaseTool subclasses compiles their Pydantic schemas, so the classes
+    are created on first use and shared; each tool instance carries its client.
     
-    Args:
-        genie_client: Initialized GenieMCPClient instance
-        
     Returns:
-        LangChain tool for Genie queries
+        Tuple of (single query, batch query) tool classes
     """
     from langchain.tools import BaseTool
     from pydantic import BaseModel, Field
@@ -137,41 +210,119 @@ def create_genie_tool_for_langchain(genie_client: GenieMCPClient):
     class GenieQueryInput(BaseModel):
         query: str = Field(description="Natural language query for Genie space")
     
+    class GenieBatchQueryInput(BaseModel):
+        queries: List[str] = Field(description="Independent natural language queries for Genie space")
+    
     class GenieMCPTool(BaseTool):
         name: str = "genie_mcp_query"
         description: str = """Query structured data using natural language through Genie MCP server. 
         Use this tool to analyze data, get insights, and answer questions about structured data tables.
         This tool connects to the managed Genie MCP server for advanced data analysis."""
         args_schema: type[BaseModel] = GenieQueryInput
+        genie_client: Any = None
         
         def _run(self, query: str) -> str:
             """Execute Genie query through MCP server"""
-            result = genie_client.query_genie(query)
+            result = self.genie_client.query_genie(query)
             
             if result["success"]:
                 return f"Genie Analysis:\n{result['result']}"
             else:
                 return f"Error querying Genie: {result['error']}"
     
-    return GenieMCPTool()
+    class GenieBatchQueryTool(BaseTool):
+        name: str = "genie_mcp_batch_query"
+        description: str = """Ask Genie several independent questions about structured data at once.
+        Use this instead of multiple genie_mcp_query calls when a request needs more than one analysis;
+        the queries run concurrently against the managed Genie MCP server."""
+        args_schema: type[BaseModel] = GenieBatchQueryInput
+        genie_client: Any = None
+        
+        def _run(self, queries: List[str]) -> str:
+            """Execute Genie queries concurrently through MCP server"""
+            results = self.genie_client.batch_query_sync(queries)
+            
+            return "\n\n".join(
+                f"Genie Analysis for '{result['query']}':\n{result['result']}" if result["success"]
+                else f"Error querying Genie for '{result['query']}': {result['error']}"
+                for result in results
+            )
+    
+    return GenieMCPTool, GenieBatchQueryTool
+
+def create_genie_tool_for_langchain(genie_client: GenieMCPClient):
+    """
+    Create a LangChain tool wrapper for Genie MCP client
+    
+    Args:
+        genie_client: Initialized GenieMCPClient instance
+        
+    Returns:
+        LangChain tool for Genie queries
+    """
+    query_tool, _ = _genie_tool_classes()
+    return query_tool(genie_client=genie_client)
+
+def create_genie_batch_tool_for_langchain(genie_client: GenieMCPClient):
+    """
+    Create a LangChain tool that sends several questions to Genie in one tool call
+    
+    Args:
+        genie_client: Initialized GenieMCPClient instance
+        
+    Returns:
+        LangChain tool for batched Genie queries
+    """
+    _, batch_tool = _genie_tool_classes()
+    return batch_tool(genie_client=genie_client)
 
 # Configuration - Import from config.py
 try:
-    from config import WORKSPACE_HOSTNAME, DATABRICKS_PROFILE, GENIE_SPACE_ID
+    from config import WORKSPACE_HOSTNAME, DATABRICKS_PROFILE, GENIE_SPACE_ID, MCP_CONNECT_TIMEOUT, MCP_READ_TIMEOUT
 except ImportError:
     # Fallback values if importing fails
     WORKSPACE_HOSTNAME = "adb-984752964297111.11.azuredatabricks.net"
     GENIE_SPACE_ID = "01f06a3068a81406a386e8eaefc74545"
     DATABRICKS_PROFILE = "DEFAULT_azure"
+    MCP_CONNECT_TIMEOUT = 10.0
+    MCP_READ_TIMEOUT = 60.0
+
+# Initialized clients are cached per (hostname, space, profile) for the life of the process
+_CLIENT_CACHE = ClientCache()
 
-def get_genie_mcp_client() -> GenieMCPClient:
-    """Get initialized Genie MCP client"""
-    return GenieMCPClient(
-        workspace_hostname=WORKSPACE_HOSTNAME,
-        genie_space_id=GENIE_SPACE_ID,
-        profile=DATABRICKS_PROFILE
+def get_genie_mcp_client(workspace_hostname: Optional[str] = None,
+                         genie_space_id: Optional[str] = None,
+                         profile: Optional[str] = None) -> GenieMCPClient:
+    """
+    Get initialized Genie MCP client (cached per workspace, Genie space and profile)
+    
+    Args:
+        workspace_hostname: Databricks workspace hostname (defaults to config)
+        genie_space_id: Genie space ID (defaults to config)
+        profile: Databricks CLI profile name (defaults to config)
+        
+    Returns:
+        Cached GenieMCPClient instance
+    """
+    workspace_hostname = workspace_hostname or WORKSPACE_HOSTNAME
+    genie_space_id = genie_space_id or GENIE_SPACE_ID
+    profile = profile or DATABRICKS_PROFILE
+    return _CLIENT_CACHE.get_or_create(
+        (workspace_hostname, genie_space_id, profile),
+        lambda: GenieMCPClient(
+            workspace_hostname=workspace_hostname,
+            genie_space_id=genie_space_id,
+            profile=profile,
+            connect_timeout_s=MCP_CONNECT_TIMEOUT,
+            read_timeout_s=MCP_READ_TIMEOUT
+        ),
+        is_usable=lambda client: client.mcp_client is not None
     )
 
+def get_cache_stats() -> Dict[str, Any]:
+    """Get hit/miss statistics for the Genie MCP client cache"""
+    return _CLIENT_CACHE.stats()
+
 # Test function
 def test_genie_connection():
     """Test Genie MCP connection"""
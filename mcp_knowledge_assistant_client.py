@@ -3,63 +3,141 @@ Knowledge Assistant MCP Server Integration for Healthcare Payor AI System
 Implements Knowledge Assistant for unstructured text analysis
 """
 
-import os
-import json
-from typing import Dict, List, Any, Optional
+import asyncio
+import functools
+import logging
+import threading
+import time
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 from databricks.sdk import WorkspaceClient
-import streamlit as st
-from openai import OpenAI
+from mcp_common import ClientCache, ResponseCache, RETRYABLE_ERRORS, aretry_call, retry_call
 
 # Configuration - Import from config.py
 try:
-    from config import KNOWLEDGE_ASSISTANT_ENDPOINT_ID
+    from config import KNOWLEDGE_ASSISTANT_ENDPOINT_ID, MCP_CONNECT_TIMEOUT, MCP_READ_TIMEOUT
 except ImportError:
-    # Fallback value if importing fails
+    # Fallback values if importing fails
     KNOWLEDGE_ASSISTANT_ENDPOINT_ID = "ka-d0808962-endpoint"
+    MCP_CONNECT_TIMEOUT = 10.0
+    MCP_READ_TIMEOUT = 60.0
+
+logger = logging.getLogger(__name__)
+
+# Knowledge Assistant tokens, cached per workspace host as (token_value, expires_at)
+# so all client instances share one token per hour instead of minting one each
+_TOKEN_CACHE: Dict[str, Tuple[str, float]] = {}
+_TOKEN_LOCK = threading.Lock()
+_TOKEN_LIFETIME_SECONDS = 3600
+_TOKEN_REFRESH_MARGIN_SECONDS = 300
+
+def _get_knowledge_token(workspace_client: WorkspaceClient) -> str:
+    """
+    Get a Databricks token for the Knowledge Assistant endpoint
+    
+    Reuses the cached token for the workspace until it is within
+    _TOKEN_REFRESH_MARGIN_SECONDS of expiry, then mints a replacement. The old
+    token is not revoked: in-flight requests and running batches may still hold
+    it, and it expires on its own shortly after, so at most two are ever live.
+    
+    Args:
+        workspace_client: Databricks workspace client
+        
+    Returns:
+        Token value
+    """
+    host = workspace_client.config.host
+    with _TOKEN_LOCK:
+        cached = _TOKEN_CACHE.get(host)
+        now = time.monotonic()
+        if cached and cached[1] - now > _TOKEN_REFRESH_MARGIN_SECONDS:
+            return cached[0]
+        
+        token = workspace_client.tokens.create(
+            comment=f"knowledge-assistant-{time.time_ns()}",
+            lifetime_seconds=_TOKEN_LIFETIME_SECONDS
+        )
+        _TOKEN_CACHE[host] = (token.token_value, now + _TOKEN_LIFETIME_SECONDS)
+        return token.token_value
 
 class KnowledgeAssistantMCPClient:
     """Client for Knowledge Assistant functionality"""
     
-    def __init__(self, workspace_client: WorkspaceClient):
+    def __init__(self, workspace_client: WorkspaceClient, connect_timeout_s: float = 10.0, read_timeout_s: float = 60.0):
         """
         Initialize Knowledge Assistant client
         
         Args:
             workspace_client: Databricks workspace client
+            connect_timeout_s: Timeout in seconds for connecting to the serving endpoint
+            read_timeout_s: Timeout in seconds for waiting on Knowledge Assistant responses
         """
         self.workspace_client = workspace_client
+        self.connect_timeout_s = connect_timeout_s
+        self.read_timeout_s = read_timeout_s
         self.knowledge_client = None
+        self._retryable_errors = RETRYABLE_ERRORS
+        # Answers over the indexed documents are stable, so repeated queries are cached
+        self._response_cache = ResponseCache(maxsize=512, ttl_seconds=3600)
         self._setup_knowledge_client()
     
     def _setup_knowledge_client(self):
         """Setup the Knowledge Assistant client using token generation"""
         try:
-            # Generate a token using the Databricks client
-            import time
-            token = self.workspace_client.tokens.create(
-                comment=f"knowledge-assistant-{time.time_ns()}", 
-                lifetime_seconds=3600
-            )
+            # Imported here so importing this module doesn't load OpenAI/httpx
+            # until a Knowledge Assistant client is actually built
+            import httpx
+            from openai import OpenAI, APIConnectionError, APITimeoutError
+            
+            host = self.workspace_client.config.host.rstrip("/")
             
-            # Initialize OpenAI client for Knowledge Assistant
+            # Initialize OpenAI client for Knowledge Assistant with the workspace's cached token;
+            # the client is long-lived, so its default keep-alive pool is reused across queries
             self.knowledge_client = OpenAI(
-                api_key=token.token_value,
-                base_url="https://adb-984752964297111.11.azuredatabricks.net/serving-endpoints"
+                api_key=_get_knowledge_token(self.workspace_client),
+                base_url=f"{host}/serving-endpoints",
+                timeout=httpx.Timeout(
+                    connect=self.connect_timeout_s, read=self.read_timeout_s, write=10.0, pool=10.0
+                ),
+                # Retries are handled by retry_call() with _retryable_errors; the SDK's own
+                # retries would multiply with it (3 x 3 attempts at the full read timeout)
+                max_retries=0
             )
+            self._retryable_errors = RETRYABLE_ERRORS + (APIConnectionError, APITimeoutError)
             
-            # Store token info for cleanup
-            self._token_info = token.token_info
-            st.success("✅ Knowledge Assistant client initialized")
+            logger.info("Knowledge Assistant client initialized")
         except Exception as e:
-            st.warning(f"⚠️ Failed to setup Knowledge Assistant client: {e}")
+            logger.warning("Failed to setup Knowledge Assistant client: %s", e)
             self.knowledge_client = None
     
-    def query_knowledge(self, query: str) -> Dict[str, Any]:
+    def _refresh_api_key(self):
+        """Point the OpenAI client at the current cached token (clients outlive a single token)"""
+        self.knowledge_client.api_key = _get_knowledge_token(self.workspace_client)
+    
+    def _new_async_client(self, api_key: str):
+        """
+        Build an AsyncOpenAI client with the sync client's endpoint and timeouts
+        
+        Async clients are bound to the event loop they are used on, so callers open
+        one per loop with "async with" (which closes its connections) instead of
+        keeping it on this shared, cross-thread instance.
+        """
+        from openai import AsyncOpenAI
+        
+        return AsyncOpenAI(
+            api_key=api_key,
+            base_url=self.knowledge_client.base_url,
+            timeout=self.knowledge_client.timeout,
+            max_retries=0
+        )
+    
+    def query_knowledge(self, query: str, cache: bool = True) -> Dict[str, Any]:
         """
         Query Knowledge Assistant for unstructured text analysis
         
         Args:
             query: Natural language query for knowledge analysis
+            cache: Serve repeated queries from the response cache; pass False to
+                always query the endpoint (the fresh result is still not cached)
             
         Returns:
             Dictionary containing query results
@@ -72,9 +150,149 @@ class KnowledgeAssistantMCPClient:
                 "tool_used": "Knowledge Assistant"
             }
         
+        if cache:
+            cached = self._response_cache.get(query)
+            if cached is not None:
+                return {
+                    "success": True,
+                    "query": query,
+                    "result": cached,
+                    "tool_used": "Knowledge Assistant"
+                }
+        
         try:
+            self._refresh_api_key()
+            
             # Use the OpenAI client to query the Knowledge Assistant
-            response = self.knowledge_client.responses.create(
+            response = retry_call(
+                self.knowledge_client.responses.create,
+                retry_on=self._retryable_errors,
+                model=KNOWLEDGE_ASSISTANT_ENDPOINT_ID,
+                input=[
+                    {
+                        "role": "user",
+                        "content": query
+                    }
+                ]
+            )
+            
+            if response.output and len(response.output) > 0:
+                text = response.output[0].content[0].text
+                if cache:
+                    self._response_cache.put(query, text)
+                return {
+                    "success": True,
+                    "query": query,
+                    "result": text,
+                    "tool_used": "Knowledge Assistant"
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": "No response from Knowledge Assistant",
+                    "query": query,
+                    "tool_used": "Knowledge Assistant"
+                }
+                
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "query": query,
+                "tool_used": "Knowledge Assistant"
+            }
+    
+    def stream_knowledge(self, query: str, cache: bool = True) -> Iterator[str]:
+        """
+        Stream a Knowledge Assistant answer as it is generated
+        
+        Yields text deltas so UI code can render partial output, e.g.
+        st.write_stream(client.stream_knowledge(query)). The complete answer
+        is cached like query_knowledge() results.
+        
+        Args:
+            query: Natural language query for knowledge analysis
+            cache: Serve repeated queries from the response cache
+            
+        Yields:
+            Chunks of the answer text
+        """
+        if not self.knowledge_client:
+            raise RuntimeError("Knowledge Assistant client not initialized")
+        
+        if cache:
+            cached = self._response_cache.get(query)
+            if cached is not None:
+                yield cached
+                return
+        
+        self._refresh_api_key()
+        stream = retry_call(
+            self.knowledge_client.responses.create,
+            retry_on=self._retryable_errors,
+            model=KNOWLEDGE_ASSISTANT_ENDPOINT_ID,
+            input=[
+                {
+                    "role": "user",
+                    "content": query
+                }
+            ],
+            stream=True
+        )
+        
+        chunks = []
+        # Closing the stream returns its connection to the pool even if the consumer
+        # stops early (e.g. a Streamlit rerun raises GeneratorExit mid-stream)
+        with stream:
+            for event in stream:
+                if event.type == "response.output_text.delta":
+                    chunks.append(event.delta)
+                    yield event.delta
+        
+        if cache and chunks:
+            self._response_cache.put(query, "".join(chunks))
+    
+    async def aquery_knowledge(self, query: str, cache: bool = True, async_client=None) -> Dict[str, Any]:
+        """
+        Async version of query_knowledge() using an AsyncOpenAI client
+        
+        Args:
+            query: Natural language query for knowledge analysis
+            cache: Serve repeated queries from the response cache
+            async_client: Open AsyncOpenAI client to send the request on (batch_query_knowledge()
+                shares one across its queries); if omitted, one is opened for this call
+            
+        Returns:
+            Dictionary containing query results
+        """
+        if not self.knowledge_client:
+            return {
+                "success": False,
+                "error": "Knowledge Assistant client not initialized",
+                "query": query,
+                "tool_used": "Knowledge Assistant"
+            }
+        
+        if cache:
+            cached = self._response_cache.get(query)
+            if cached is not None:
+                return {
+                    "success": True,
+                    "query": query,
+                    "result": cached,
+                    "tool_used": "Knowledge Assistant"
+                }
+        
+        try:
+            if async_client is None:
+                # Token minting is a blocking SDK call, so keep it off the event loop
+                api_key = await asyncio.to_thread(_get_knowledge_token, self.workspace_client)
+                async with self._new_async_client(api_key) as async_client:
+                    return await self.aquery_knowledge(query, cache, async_client)
+            
+            response = await aretry_call(
+                async_client.responses.create,
+                retry_on=self._retryable_errors,
                 model=KNOWLEDGE_ASSISTANT_ENDPOINT_ID,
                 input=[
                     {
@@ -85,10 +303,13 @@ class KnowledgeAssistantMCPClient:
             )
             
             if response.output and len(response.output) > 0:
+                text = response.output[0].content[0].text
+                if cache:
+                    self._response_cache.put(query, text)
                 return {
                     "success": True,
                     "query": query,
-                    "result": response.output[0].content[0].text,
+                    "result": text,
                     "tool_used": "Knowledge Assistant"
                 }
             else:
@@ -107,6 +328,45 @@ class KnowledgeAssistantMCPClient:
                 "tool_used": "Knowledge Assistant"
             }
     
+    async def batch_query_knowledge(self, queries: List[str], max_concurrency: int = 10) -> List[Dict[str, Any]]:
+        """
+        Run several Knowledge Assistant queries concurrently over one async client
+        
+        Args:
+            queries: Natural language queries for knowledge analysis
+            max_concurrency: Maximum number of requests in flight at once
+            
+        Returns:
+            List of query result dictionaries, in the same order as queries
+        """
+        if not self.knowledge_client:
+            return [await self.aquery_knowledge(query) for query in queries]
+        
+        try:
+            api_key = await asyncio.to_thread(_get_knowledge_token, self.workspace_client)
+        except Exception as e:
+            return [
+                {"success": False, "error": str(e), "query": query, "tool_used": "Knowledge Assistant"}
+                for query in queries
+            ]
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async with self._new_async_client(api_key) as async_client:
+            async def run(query: str) -> Dict[str, Any]:
+                async with semaphore:
+                    return await self.aquery_knowledge(query, async_client=async_client)
+            
+            return await asyncio.gather(*(run(q) for q in queries))
+    
+    def batch_query_knowledge_sync(self, queries: List[str], max_concurrency: int = 10) -> List[Dict[str, Any]]:
+        """Synchronous wrapper around batch_query_knowledge() for non-async callers"""
+        return asyncio.run(self.batch_query_knowledge(queries, max_concurrency))
+    
+    def invalidate_cache(self):
+        """Drop all cached Knowledge Assistant answers"""
+        self._response_cache.clear()
+    
     def get_health_status(self) -> Dict[str, Any]:
         """Check health status of Knowledge Assistant connection"""
         try:
@@ -122,15 +382,13 @@ class KnowledgeAssistantMCPClient:
                 "endpoint": KNOWLEDGE_ASSISTANT_ENDPOINT_ID
             }
 
-def create_knowledge_assistant_tool_for_langchain(knowledge_client: KnowledgeAssistantMCPClient):
+@functools.lru_cache(maxsize=None)
+def _knowledge_tool_class() -> type:
     """
-    Create a LangChain tool wrapper for Knowledge Assistant
+    Build the LangChain tool class for Knowledge Assistant once per process
     
-    Args:
-        knowledge_client: Initialized KnowledgeAssistantMCPClient instance
-        
     Returns:
-        LangChain tool for Knowledge Assistant queries
+        Knowledge Assistant tool class; each instance carries its client
     """
     from langchain.tools import BaseTool
     from pydantic import BaseModel, Field
@@ -150,18 +408,47 @@ def create_knowledge_assistant_tool_for_langchain(knowledge_client: KnowledgeAss
         
         Use this when you need to search through documents, analyze text content, or find information that isn't in structured databases."""
         args_schema: type[BaseModel] = KnowledgeQueryInput
+        knowledge_client: Any = None
         
         def _run(self, query: str) -> str:
             """Execute Knowledge Assistant query"""
-            result = knowledge_client.query_knowledge(query)
+            result = self.knowledge_client.query_knowledge(query)
             
             if result["success"]:
                 return f"Knowledge Analysis:\n{result['result']}"
             else:
                 return f"Error querying Knowledge Assistant: {result['error']}"
     
-    return KnowledgeAssistantTool()
+    return KnowledgeAssistantTool
+
+def create_knowledge_assistant_tool_for_langchain(knowledge_client: KnowledgeAssistantMCPClient):
+    """
+    Create a LangChain tool wrapper for Knowledge Assistant
+    
+    Args:
+        knowledge_client: Initialized KnowledgeAssistantMCPClient instance
+        
+    Returns:
+        LangChain tool for Knowledge Assistant queries
+    """
+    return _knowledge_tool_class()(knowledge_client=knowledge_client)
+
+# Initialized clients are cached per (workspace client, endpoint) for the life of the process.
+# Workspace clients are shared per profile (see mcp_common), so their identity is a stable key.
+_CLIENT_CACHE = ClientCache()
 
 def get_knowledge_assistant_mcp_client(workspace_client: WorkspaceClient) -> KnowledgeAssistantMCPClient:
-    """Get initialized Knowledge Assistant MCP client"""
-    return KnowledgeAssistantMCPClient(workspace_client)
+    """Get initialized Knowledge Assistant MCP client (cached per workspace client and endpoint)"""
+    return _CLIENT_CACHE.get_or_create(
+        (id(workspace_client), KNOWLEDGE_ASSISTANT_ENDPOINT_ID),
+        lambda: KnowledgeAssistantMCPClient(
+            workspace_client,
+            connect_timeout_s=MCP_CONNECT_TIMEOUT,
+            read_timeout_s=MCP_READ_TIMEOUT
+        ),
+        is_usable=lambda client: client.knowledge_client is not None
+    )
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Get hit/miss statistics for the Knowledge Assistant client cache"""
+    return _CLIENT_CACHE.stats()
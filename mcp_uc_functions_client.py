@@ -3,17 +3,23 @@ Unity Catalog Functions MCP Server Integration for Healthcare Payor AI System
 Implements managed MCP server for UC functions
 """
 
-import os
-import json
-from typing import Dict, List, Any, Optional
-from databricks.sdk import WorkspaceClient
+import functools
+import logging
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Literal, Optional
+from databricks.sdk.errors import DatabricksError
 from databricks_mcp import DatabricksMCPClient
-import streamlit as st
+from mcp_common import ClientCache, ResponseCache, call_with_timeout, get_workspace_client, is_cacheable, is_retryable, retry_call
+
+logger = logging.getLogger(__name__)
 
 class UCFunctionsMCPClient:
     """Client for interacting with Unity Catalog Functions managed MCP server"""
     
-    def __init__(self, workspace_hostname: str, catalog: str, schema: str, profile: str = "DEFAULT_azure"):
+    def __init__(self, workspace_hostname: str, catalog: str, schema: str, profile: str = "DEFAULT_azure",
+                 cache_ttl_seconds: float = 300, connect_timeout_s: float = 10.0, read_timeout_s: float = 60.0):
         """
         Initialize UC Functions MCP client
         
@@ -22,19 +28,35 @@ class UCFunctionsMCPClient:
             catalog: Unity Catalog name
             schema: Schema name containing UC functions
             profile: Databricks CLI profile name
+            cache_ttl_seconds: How long the function list from list_tools() is reused
+            connect_timeout_s: Timeout in seconds for quick metadata calls such as list_tools()
+            read_timeout_s: Timeout in seconds for UC function calls through MCP
         """
         self.workspace_hostname = workspace_hostname
         self.catalog = catalog
         self.schema = schema
         self.profile = profile
+        # Function name prefixes, built once: MCP tool names use catalog__schema__name,
+        # direct UC calls use catalog.schema.name
+        self._mcp_prefix = f"{catalog}__{schema}__"
+        self._uc_prefix = f"{catalog}.{schema}."
+        self._tools_ttl = cache_ttl_seconds
+        self.connect_timeout_s = connect_timeout_s
+        self.read_timeout_s = read_timeout_s
+        # Worker threads that bound MCP calls to the timeouts above (see call_with_timeout)
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="uc-functions-mcp")
+        self._tools_cache: Optional[List[Dict[str, Any]]] = None
+        self._tools_cache_ts: float = 0.0
+        # Member/claims/provider lookups are deterministic per arguments; cache them briefly
+        self._response_cache = ResponseCache(maxsize=512, ttl_seconds=300)
+        # Circuit breaker: after an MCP failure, calls go straight to the direct path
+        # until the cooldown (1s, 2s, 4s, ... capped at 60s) expires
+        self._mcp_cooldown_until: float = 0.0
+        self._mcp_failure_count: int = 0
         self.mcp_url = f"https://{workspace_hostname}/api/2.0/mcp/functions/{catalog}/{schema}"
         
-        # Initialize workspace client
-        if profile == "auto-detect":
-            # In cloud environments, let the SDK auto-detect the profile
-            self.workspace_client = WorkspaceClient()
-        else:
-            self.workspace_client = WorkspaceClient(profile=profile)
+        # Reuse the shared workspace client for this profile
+        self.workspace_client = get_workspace_client(profile)
         
         # In cloud environments, get hostname from workspace client if not provided
         if not workspace_hostname or workspace_hostname == "auto-detect":
@@ -42,7 +64,7 @@ class UCFunctionsMCPClient:
                 # Try to get hostname from workspace client (works in cloud environments)
                 self.workspace_hostname = self.workspace_client.config.host
                 self.mcp_url = f"https://{self.workspace_hostname}/api/2.0/mcp/functions/{catalog}/{schema}"
-            except:
+            except AttributeError:
                 # Fallback to provided hostname
                 self.workspace_hostname = workspace_hostname
                 self.mcp_url = f"https://{workspace_hostname}/api/2.0/mcp/functions/{catalog}/{schema}"
@@ -58,9 +80,9 @@ class UCFunctionsMCPClient:
                 server_url=self.mcp_url,
                 workspace_client=self.workspace_client
             )
-            st.success(f"✅ Connected to UC Functions MCP server: {self.mcp_url}")
+            logger.info("Connected to UC Functions MCP server: %s", self.mcp_url)
         except Exception as e:
-            st.error(f"❌ Failed to connect to UC Functions MCP server: {e}")
+            logger.error("Failed to connect to UC Functions MCP server: %s", e)
             self.mcp_client = None
     
     def list_tools(self) -> List[Dict[str, Any]]:
@@ -68,58 +90,96 @@ class UCFunctionsMCPClient:
         if not self.mcp_client:
             return []
         
+        # Tool schemas are stable for a server version, so reuse them until the TTL expires
+        if self._tools_cache and time.monotonic() - self._tools_cache_ts < self._tools_ttl:
+            return self._tools_cache
+        
         try:
-            tools = self.mcp_client.list_tools()
-            return [{"name": tool.name, "description": tool.description} for tool in tools]
+            tools = call_with_timeout(self._executor, self.mcp_client.list_tools, self.connect_timeout_s)
+            self._tools_cache = [{"name": tool.name, "description": tool.description} for tool in tools]
+            self._tools_cache_ts = time.monotonic()
+            return self._tools_cache
         except Exception as e:
-            st.error(f"❌ Failed to list UC functions: {e}")
+            logger.error("Failed to list UC functions: %s", e)
             return []
     
-    def call_function(self, function_name: str, **kwargs) -> Dict[str, Any]:
+    def call_function(self, function_name: str, *, force_refresh: bool = False, **kwargs) -> Dict[str, Any]:
         """
         Call a Unity Catalog function through MCP server or direct call
         
+        Successful results are cached per function and arguments. UC function
+        authors can opt a function out (e.g. live aggregations) by returning
+        "_meta": {"cache_hint": "no-cache"}; deterministic lookups need no hint.
+        
         Args:
             function_name: Name of the UC function to call
+            force_refresh: Skip the cache lookup but store the fresh result
             **kwargs: Arguments for the function
             
         Returns:
             Dictionary containing function results
         """
-        # Try MCP client first
-        if self.mcp_client:
+        cache_key = (function_name, tuple(sorted(kwargs.items())))
+        try:
+            hash(cache_key)
+        except TypeError:
+            # Unhashable argument values (e.g. lists) can't be cache keys; just skip caching
+            cache_key = None
+        
+        if cache_key is not None and not force_refresh:
+            cached = self._response_cache.get(cache_key)
+            if cached is not None:
+                return dict(cached)
+        
+        # Try MCP client first, unless it failed recently and is still cooling down
+        if self.mcp_client and time.monotonic() >= self._mcp_cooldown_until:
             try:
-                result = self.mcp_client.call_tool(function_name, kwargs)
+                result = retry_call(
+                    call_with_timeout, self._executor, self.mcp_client.call_tool, self.read_timeout_s, function_name, kwargs
+                )
+                self._mcp_failure_count = 0
                 
-                return {
+                response = {
                     "success": True,
                     "function_name": function_name,
                     "arguments": kwargs,
                     "result": result.content if hasattr(result, 'content') else str(result),
                     "tool_used": "UC Functions MCP"
                 }
+                if cache_key is not None and is_cacheable(result):
+                    self._response_cache.put(cache_key, response)
+                return dict(response)
             except Exception as e:
-                st.info("ℹ️ UC Functions MCP server unavailable, trying direct database connection...")
+                # Only transport failures and timeouts (including exception groups of them, as
+                # the MCP client raises them) open the circuit; API errors for a single call
+                # (e.g. bad arguments) say nothing about the server's availability
+                if is_retryable(e, no_retry_on=(DatabricksError,)):
+                    self._mcp_cooldown_until = time.monotonic() + min(60, 2 ** self._mcp_failure_count)
+                    self._mcp_failure_count += 1
+                logger.info("UC Functions MCP server unavailable (%s), trying direct database connection...", e)
         
         # Fallback to direct UC function call
         try:
-            # Extract function name without catalog.schema prefix
-            simple_function_name = function_name.split('__')[-1]
-            full_function_name = f"{self.catalog}.{self.schema}.{simple_function_name}"
+            # Swap the MCP catalog__schema__ prefix for the UC catalog.schema. prefix
+            full_function_name = self._uc_prefix + function_name.removeprefix(self._mcp_prefix)
             
             # Call function directly
-            result = self.workspace_client.functions.call_function(
+            result = retry_call(
+                self.workspace_client.functions.call_function,
                 function_name=full_function_name,
                 arguments=kwargs
             )
             
-            return {
+            response = {
                 "success": True,
                 "function_name": function_name,
                 "arguments": kwargs,
                 "result": result,
                 "tool_used": "UC Functions Direct"
             }
+            if cache_key is not None:
+                self._response_cache.put(cache_key, response)
+            return dict(response)
         except Exception as e:
             return {
                 "success": False,
@@ -129,24 +189,69 @@ class UCFunctionsMCPClient:
                 "tool_used": "UC Functions (Unavailable)"
             }
     
+    def invalidate_cache(self):
+        """Drop all cached UC function results"""
+        self._response_cache.clear()
+    
     def lookup_member(self, input_id: str) -> Dict[str, Any]:
         """Lookup member information using UC function"""
-        function_name = f"{self.catalog}__{self.schema}__lookup_member"
+        function_name = self._mcp_prefix + "lookup_member"
         return self.call_function(function_name, input_id=input_id)
     
     def lookup_claims(self, member_id: str) -> Dict[str, Any]:
         """Lookup claims for a member using UC function"""
-        function_name = f"{self.catalog}__{self.schema}__lookup_claims"
+        function_name = self._mcp_prefix + "lookup_claims"
         return self.call_function(function_name, input_id=member_id)
     
     def lookup_providers(self, specialty_filter: str = None) -> Dict[str, Any]:
         """Lookup providers using UC function"""
-        function_name = f"{self.catalog}__{self.schema}__lookup_providers"
+        function_name = self._mcp_prefix + "lookup_providers"
         kwargs = {"specialty_filter": specialty_filter} if specialty_filter else {}
         return self.call_function(function_name, **kwargs)
     
+    async def batch_call(self, operations: List[Dict[str, Any]], max_concurrent: int = 4) -> List[Dict[str, Any]]:
+        """
+        Call several independent UC functions concurrently
+        
+        Args:
+            operations: List of {"function_name": str, "arguments": dict} entries
+            max_concurrent: Maximum number of calls in flight at once
+            
+        Returns:
+            List of result dictionaries, in the same order as operations
+        """
+        semaphore = asyncio.Semaphore(max_concurrent)
+        
+        async def run(operation: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                # DatabricksMCPClient is synchronous, so each call runs in a worker thread
+                return await asyncio.to_thread(
+                    self.call_function, operation["function_name"], **operation.get("arguments", {})
+                )
+        
+        results = await asyncio.gather(*(run(op) for op in operations), return_exceptions=True)
+        return [
+            result if not isinstance(result, BaseException) else {
+                "success": False,
+                "error": str(result),
+                "function_name": op["function_name"],
+                "arguments": op.get("arguments", {}),
+                "tool_used": "UC Functions (Unavailable)"
+            }
+            for op, result in zip(operations, results)
+        ]
+    
+    def batch_call_sync(self, operations: List[Dict[str, Any]], max_concurrent: int = 4) -> List[Dict[str, Any]]:
+        """Synchronous wrapper around batch_call() for non-async callers such as LangChain tools"""
+        return asyncio.run(self.batch_call(operations, max_concurrent))
+    
     def get_health_status(self) -> Dict[str, Any]:
-        """Check health status of UC Functions MCP connection"""
+        """
+        Check health status of UC Functions MCP connection
+        
+        Within the tool-list TTL this is answered from list_tools()'s cache; once it
+        expires the server is contacted again, so an outage shows up as unhealthy.
+        """
         try:
             tools = self.list_tools()
             return {
@@ -164,15 +269,24 @@ class UCFunctionsMCPClient:
                 "mcp_url": self.mcp_url
             }
 
-def create_uc_functions_tools_for_langchain(uc_client: UCFunctionsMCPClient):
+# Argument name each UC lookup function expects, used by the batch lookup tool
+BATCH_ARGUMENT_NAMES = {
+    "lookup_member": "input_id",
+    "lookup_claims": "input_id",
+    "lookup_providers": "specialty_filter",
+}
+
+@functools.lru_cache(maxsize=None)
+def _uc_tool_classes() -> tuple:
     """
-    Create LangChain tool wrappers for UC Functions MCP client
+    Build the LangChain tool classes for UC functions once per process
+    
+    Defining BaseTool subclasses compiles their Pydantic schemas, so the classes
+    are created on first use and shared; each tool instance carries its client
+    and catalog/schema-specific name and description as fields.
     
-    Args:
-        uc_client: Initialized UCFunctionsMCPClient instance
-        
     Returns:
-        List of LangChain tools for UC functions
+        Tuple of (member, claims, providers, batch) lookup tool classes
     """
     from langchain.tools import BaseTool
     from pydantic import BaseModel, Field
@@ -186,47 +300,108 @@ def create_uc_functions_tools_for_langchain(uc_client: UCFunctionsMCPClient):
     class ProvidersLookupInput(BaseModel):
         specialty_filter: str = Field(description="Provider specialty to filter by", default="")
     
+    class BatchLookupOperation(BaseModel):
+        function: Literal["lookup_member", "lookup_claims", "lookup_providers"] = Field(description="UC function to call")
+        value: str = Field(description="Member ID for lookup_member/lookup_claims, or specialty for lookup_providers", default="")
+    
+    class BatchLookupInput(BaseModel):
+        operations: List[BatchLookupOperation] = Field(description="Independent lookups to run concurrently")
+    
     class UCMemberLookupTool(BaseTool):
-        name: str = f"{uc_client.catalog}__{uc_client.schema}__lookup_member"
-        description: str = f"Returns member information from {uc_client.catalog}.{uc_client.schema}.members table"
         args_schema: type[BaseModel] = MemberLookupInput
+        uc_client: Any = None
         
         def _run(self, input_id: str) -> str:
-            result = uc_client.lookup_member(input_id)
+            result = self.uc_client.lookup_member(input_id)
             if result["success"]:
                 return result["result"]
             else:
                 return f"Error: {result['error']}"
     
     class UCClaimsLookupTool(BaseTool):
-        name: str = f"{uc_client.catalog}__{uc_client.schema}__lookup_claims"
-        description: str = f"Returns claims for a member from {uc_client.catalog}.{uc_client.schema}.claims table"
         args_schema: type[BaseModel] = ClaimsLookupInput
+        uc_client: Any = None
         
         def _run(self, member_id: str) -> str:
-            result = uc_client.lookup_claims(member_id)
+            result = self.uc_client.lookup_claims(member_id)
             if result["success"]:
                 return result["result"]
             else:
                 return f"Error: {result['error']}"
     
     class UCProvidersLookupTool(BaseTool):
-        name: str = f"{uc_client.catalog}__{uc_client.schema}__lookup_providers"
-        description: str = f"Returns providers by specialty from {uc_client.catalog}.{uc_client.schema}.providers table"
         args_schema: type[BaseModel] = ProvidersLookupInput
+        uc_client: Any = None
         
         def _run(self, specialty_filter: str = "") -> str:
-            result = uc_client.lookup_providers(specialty_filter)
+            result = self.uc_client.lookup_providers(specialty_filter)
             if result["success"]:
                 return result["result"]
             else:
                 return f"Error: {result['error']}"
     
-    return [UCMemberLookupTool(), UCClaimsLookupTool(), UCProvidersLookupTool()]
+    class UCBatchLookupTool(BaseTool):
+        args_schema: type[BaseModel] = BatchLookupInput
+        uc_client: Any = None
+        
+        def _run(self, operations: List[BatchLookupOperation]) -> str:
+            calls = [
+                {
+                    "function_name": self.uc_client._mcp_prefix + op.function,
+                    "arguments": {BATCH_ARGUMENT_NAMES[op.function]: op.value} if op.value else {}
+                }
+                for op in operations
+            ]
+            results = self.uc_client.batch_call_sync(calls)
+            return "\n\n".join(
+                f"{op.function}({op.value}): " + (str(result["result"]) if result["success"] else f"Error: {result['error']}")
+                for op, result in zip(operations, results)
+            )
+    
+    return UCMemberLookupTool, UCClaimsLookupTool, UCProvidersLookupTool, UCBatchLookupTool
+
+def create_uc_functions_tools_for_langchain(uc_client: UCFunctionsMCPClient):
+    """
+    Create LangChain tool wrappers for UC Functions MCP client
+    
+    Args:
+        uc_client: Initialized UCFunctionsMCPClient instance
+        
+    Returns:
+        List of LangChain tools for UC functions
+    """
+    member_tool, claims_tool, providers_tool, batch_tool = _uc_tool_classes()
+    table_prefix = f"{uc_client.catalog}.{uc_client.schema}"
+    
+    return [
+        member_tool(
+            name=uc_client._mcp_prefix + "lookup_member",
+            description=f"Returns member information from {table_prefix}.members table",
+            uc_client=uc_client
+        ),
+        claims_tool(
+            name=uc_client._mcp_prefix + "lookup_claims",
+            description=f"Returns claims for a member from {table_prefix}.claims table",
+            uc_client=uc_client
+        ),
+        providers_tool(
+            name=uc_client._mcp_prefix + "lookup_providers",
+            description=f"Returns providers by specialty from {table_prefix}.providers table",
+            uc_client=uc_client
+        ),
+        batch_tool(
+            name=uc_client._mcp_prefix + "batch_lookup",
+            description=(
+                f"Runs several member, claims and provider lookups from {table_prefix} "
+                "concurrently in one call. Use this instead of multiple single lookups when the lookups are independent."
+            ),
+            uc_client=uc_client
+        )
+    ]
 
 # Configuration - Import from config.py
 try:
-    from config import WORKSPACE_HOSTNAME, CATALOG_NAME, SCHEMA_NAME, DATABRICKS_PROFILE
+    from config import WORKSPACE_HOSTNAME, CATALOG_NAME, SCHEMA_NAME, DATABRICKS_PROFILE, MCP_CONNECT_TIMEOUT, MCP_READ_TIMEOUT
     CATALOG = CATALOG_NAME
     SCHEMA = SCHEMA_NAME
 except ImportError:
@@ -235,16 +410,49 @@ except ImportError:
     CATALOG = "my_catalog"
     SCHEMA = "payer_silver"
     DATABRICKS_PROFILE = "DEFAULT_azure"
+    MCP_CONNECT_TIMEOUT = 10.0
+    MCP_READ_TIMEOUT = 60.0
+
+# Initialized clients are cached per (hostname, catalog, schema, profile) for the life of the process
+_CLIENT_CACHE = ClientCache()
 
-def get_uc_functions_mcp_client() -> UCFunctionsMCPClient:
-    """Get initialized UC Functions MCP client"""
-    return UCFunctionsMCPClient(
-        workspace_hostname=WORKSPACE_HOSTNAME,
-        catalog=CATALOG,
-        schema=SCHEMA,
-        profile=DATABRICKS_PROFILE
+def get_uc_functions_mcp_client(workspace_hostname: Optional[str] = None,
+                                catalog: Optional[str] = None,
+                                schema: Optional[str] = None,
+                                profile: Optional[str] = None) -> UCFunctionsMCPClient:
+    """
+    Get initialized UC Functions MCP client (cached per workspace, catalog, schema and profile)
+    
+    Args:
+        workspace_hostname: Databricks workspace hostname (defaults to config)
+        catalog: Unity Catalog catalog name (defaults to config)
+        schema: Unity Catalog schema name (defaults to config)
+        profile: Databricks CLI profile name (defaults to config)
+        
+    Returns:
+        Cached UCFunctionsMCPClient instance
+    """
+    workspace_hostname = workspace_hostname or WORKSPACE_HOSTNAME
+    catalog = catalog or CATALOG
+    schema = schema or SCHEMA
+    profile = profile or DATABRICKS_PROFILE
+    return _CLIENT_CACHE.get_or_create(
+        (workspace_hostname, catalog, schema, profile),
+        lambda: UCFunctionsMCPClient(
+            workspace_hostname=workspace_hostname,
+            catalog=catalog,
+            schema=schema,
+            profile=profile,
+            connect_timeout_s=MCP_CONNECT_TIMEOUT,
+            read_timeout_s=MCP_READ_TIMEOUT
+        ),
+        is_usable=lambda client: client.mcp_client is not None
     )
 
+def get_cache_stats() -> Dict[str, Any]:
+    """Get hit/miss statistics for the UC Functions MCP client cache"""
+    return _CLIENT_CACHE.stats()
+
 # Test function
 def test_uc_functions_connection():
     """Test UC Functions MCP connection"""
@@ -32,8 +32,16 @@ echo "   - Genie: https://adb-984752964297111.11.azuredatabricks.net/api/2.0/mcp
 echo "   - UC Functions: https://adb-984752964297111.11.azuredatabricks.net/api/2.0/mcp/functions/my_catalog/payer_silver"
 echo ""
 
+# Watch source files for changes only when debugging (DEBUG=true ./start_mcp_app.sh)
+if [ "$DEBUG" = "true" ]; then
+    FILE_WATCHER=auto
+else
+    FILE_WATCHER=none
+fi
+
 streamlit run enhanced_healthcare_payor_app_mcp.py \
     --server.port $PORT \
+    --server.fileWatcherType $FILE_WATCHER \
     --server.headless true \
     --server.enableCORS false \
     --server.enableXsrfProtection false \